@@ -6,30 +6,207 @@ Sistema completo para gestionar productos, stock y vencimientos
 @version 1.0.0
 """
 
+from array import array
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from itertools import compress
+from typing import Deque, List, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+import heapq
 import json
-from dataclasses import dataclass, asdict
-from enum import Enum
+import logging
+import math
+import operator
+import re
+import sys
+import time
+from dataclasses import dataclass, fields
+from enum import IntEnum
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional; sin él se usa json de la biblioteca estándar
+    orjson = None
+
+# Mensajes de estado; silenciados salvo que la aplicación configure logging
+logger = logging.getLogger("inventory")
+
+# Marca de "sin vencimiento" en la columna de timestamps: nunca es anterior a "ahora"
+_NO_EXPIRATION = 2 ** 63 - 1
+_SECONDS_PER_DAY = 86400
+_TOKEN_PATTERN = re.compile(r"\w+")
+# Separa nombre y descripción en el texto de búsqueda cacheado; no aparece en textos reales
+_SEARCH_SEPARATOR = "\x00"
+# Cantidad máxima de transacciones conservadas en el historial
+MAX_TRANSACTIONS = 100_000
+# Campos de Product reflejados en las columnas e índices del inventario
+_INDEXED_FIELDS = frozenset({
+    'id', 'name', 'description', 'category', 'stock_quantity', 'min_stock', 'expiration_date'
+})
+
+
+def _to_epoch_seconds(value: Union[int, float, str, datetime, None]) -> Optional[int]:
+    """Normaliza una fecha (epoch, ISO 8601 o datetime) a segundos epoch"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        if not value:
+            return None
+        value = datetime.fromisoformat(value)
+    return int(value.timestamp())
+
 
+def _dump_json(data: Dict, pretty: bool = False, allow_orjson: bool = True) -> bytes:
+    """
+    Serializa a JSON en UTF-8 (compacto o indentado), con orjson si está disponible
 
-class ProductCategory(Enum):
+    Ambas salidas representan los mismos valores, aunque no siempre con los
+    mismos bytes: algunos floats se escriben distinto (orjson 1e16, json 1e+16).
+    Los enteros de más de 64 bits, que orjson rechaza, se escriben con json.
+    orjson escribe NaN e Infinity como null; quien tenga esos valores debe
+    pasar allow_orjson=False para conservarlos.
+    """
+    if orjson is not None and allow_orjson:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+        except orjson.JSONEncodeError:
+            pass  # enteros de más de 64 bits: json los admite
+    if pretty:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _tokenize(text_folded: str) -> set:
+    """Divide un texto ya normalizado (casefold) en los tokens del índice de búsqueda"""
+    return set(_TOKEN_PATTERN.findall(text_folded))
+
+
+def _near_expiration_window(now_ts: int, days_threshold: int) -> Tuple[int, int]:
+    """
+    Ventana [inicio, fin) de timestamps próximos a vencer
+
+    Equivale a 0 < días restantes <= days_threshold, contando días completos.
+    """
+    return (now_ts + _SECONDS_PER_DAY,
+            now_ts + (days_threshold + 1) * _SECONDS_PER_DAY)
+
+
+def _is_near_expiration(expiration_ts: Optional[int], now_ts: int, days_threshold: int = 30) -> bool:
+    """Verifica un vencimiento contra un "ahora" ya calculado"""
+    if expiration_ts is None:
+        return False
+    lower, upper = _near_expiration_window(now_ts, days_threshold)
+    return lower <= expiration_ts < upper
+
+
+def _scan_inventory(stock_column: array, min_column: array, exp_column: array,
+                    now_ts: int, near_window: Tuple[int, int]
+                    ) -> Tuple[List[int], List[int], List[int], int]:
+    """
+    Recorre las columnas una sola vez y clasifica cada fila
+
+    Returns:
+        Filas con stock bajo, filas vencidas, filas próximas a vencer
+        y el total de unidades en stock
+    """
+    near_lower, near_upper = near_window
+    low_rows: List[int] = []
+    expired_rows: List[int] = []
+    near_rows: List[int] = []
+    total_stock = 0
+    for row, (stock, min_stock, exp_ts) in enumerate(zip(stock_column, min_column, exp_column)):
+        total_stock += stock
+        if stock <= min_stock:
+            low_rows.append(row)
+        if exp_ts < now_ts:
+            expired_rows.append(row)
+        elif near_lower <= exp_ts < near_upper:
+            near_rows.append(row)
+    return low_rows, expired_rows, near_rows, total_stock
+
+
+class ProductCategory(IntEnum):
     """Categorías de productos farmacéuticos"""
-    ORTOMOLECULAR = "ortomolecular"
-    DERMOCOSMETICA = "dermocosmetica"
-    HOMEOPATIA = "homeopatia"
-    ALOPATICA = "alopatica"
-    FITOTERAPIA = "fitoterapia"
-    FLORALES = "florales"
-    PROBIOTICOS = "probioticos"
-    HORMONAS = "hormonas"
-    MATERIA_PRIMA = "materia_prima"
-    OTROS = "otros"
-
-
-@dataclass
-class Product:
-    """Clase para representar un producto farmacéutico"""
+    ORTOMOLECULAR = 0
+    DERMOCOSMETICA = 1
+    HOMEOPATIA = 2
+    ALOPATICA = 3
+    FITOTERAPIA = 4
+    FLORALES = 5
+    PROBIOTICOS = 6
+    HORMONAS = 7
+    MATERIA_PRIMA = 8
+    OTROS = 9
+
+    @property
+    def slug(self) -> str:
+        """Identificador en minúsculas (valor de la categoría en versiones anteriores)"""
+        return self.name.lower()
+
+    @classmethod
+    def parse(cls, value: Union[int, str]) -> "ProductCategory":
+        """Obtiene la categoría a partir de su código, su nombre o su slug"""
+        if isinstance(value, int):
+            return cls(value)
+        return cls[value.upper()]
+
+
+def _to_quantity(value: Union[int, float]) -> int:
+    """Normaliza una cantidad de unidades a int; acepta floats enteros como 5.0"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return operator.index(value)
+
+
+def _intern_optional(value: Optional[str]) -> Optional[str]:
+    """Proveedores y ubicaciones se repiten entre miles de productos: una sola copia"""
+    return sys.intern(value) if value else value
+
+
+# Normalización de Product al asignar: categorías por código, nombre o slug;
+# vencimientos como datetime, ISO 8601 o epoch; cantidades enteras; textos
+# repetidos internados. Un valor inválido falla antes de modificar nada.
+_FIELD_NORMALIZERS = {
+    'category': ProductCategory.parse,
+    'stock_quantity': _to_quantity,
+    'min_stock': _to_quantity,
+    'expiration_date': _to_epoch_seconds,
+    'supplier': _intern_optional,
+    'storage_location': _intern_optional,
+}
+
+
+class _InventoryLink:
+    """Vínculo de un producto con el inventario que lo contiene, fuera de los campos del dataclass"""
+    __slots__ = ('_owner',)
+
+    def __new__(cls, *args, **kwargs):
+        # Se inicializa antes que cualquier campo, incluso al copiar o deserializar
+        instance = super().__new__(cls)
+        object.__setattr__(instance, '_owner', None)
+        return instance
+
+
+class Transaction(NamedTuple):
+    """Evento del historial de inventario"""
+    timestamp: int  # segundos epoch
+    action: str
+    product_id: str
+    quantity: int
+    reason: str = ""
+
+
+@dataclass(slots=True)
+class Product(_InventoryLink):
+    """
+    Clase para representar un producto farmacéutico
+
+    Mientras pertenece a un inventario, asignar un campo indexado (stock,
+    vencimiento, categoría, nombre, descripción) actualiza también las
+    columnas e índices del InventoryManager. Las copias no pertenecen a
+    ningún inventario.
+    """
     id: str
     name: str
     category: ProductCategory
@@ -37,42 +214,64 @@ class Product:
     stock_quantity: int
     min_stock: int
     unit_price: float
-    expiration_date: Optional[datetime] = None
+    expiration_date: Optional[int] = None  # segundos epoch
     batch_number: Optional[str] = None
     supplier: Optional[str] = None
     storage_location: Optional[str] = None
 
+    def __setattr__(self, name: str, value) -> None:
+        # La normalización corre tanto al construir como en asignaciones posteriores
+        normalize = _FIELD_NORMALIZERS.get(name)
+        if normalize is not None:
+            value = normalize(value)
+        owner = self._owner
+        if owner is not None and name in _INDEXED_FIELDS:
+            owner._update_product_field(self, name, value)
+        else:
+            object.__setattr__(self, name, value)
+
+    def __getstate__(self) -> Dict:
+        # Solo los campos: copy y pickle no arrastran el inventario de origen
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    def __setstate__(self, state: Dict):
+        # Los valores ya están normalizados y la copia no pertenece a ningún inventario
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
     def is_low_stock(self) -> bool:
         """Verifica si el stock está bajo"""
         return self.stock_quantity <= self.min_stock
 
     def is_expired(self) -> bool:
         """Verifica si el producto está vencido"""
-        if not self.expiration_date:
-            return False
-        return datetime.now() > self.expiration_date
+        return self.expiration_date is not None and self.expiration_date < int(time.time())
 
     def days_until_expiration(self) -> Optional[int]:
         """Calcula los días hasta el vencimiento"""
-        if not self.expiration_date:
+        if self.expiration_date is None:
             return None
-        delta = self.expiration_date - datetime.now()
-        return delta.days
+        return (self.expiration_date - int(time.time())) // _SECONDS_PER_DAY
 
     def is_near_expiration(self, days_threshold: int = 30) -> bool:
         """Verifica si el producto está próximo a vencer"""
-        days = self.days_until_expiration()
-        if days is None:
-            return False
-        return 0 < days <= days_threshold
+        return _is_near_expiration(self.expiration_date, int(time.time()), days_threshold)
 
     def to_dict(self) -> Dict:
         """Convierte el producto a diccionario"""
-        data = asdict(self)
-        data['category'] = self.category.value
-        if self.expiration_date:
-            data['expiration_date'] = self.expiration_date.isoformat()
-        return data
+        return {
+            'id': self.id,
+            'name': self.name,
+            'category': self.category.name,
+            'description': self.description,
+            'stock_quantity': self.stock_quantity,
+            'min_stock': self.min_stock,
+            'unit_price': self.unit_price,
+            'expiration_date': self.expiration_date,
+            'batch_number': self.batch_number,
+            'supplier': self.supplier,
+            'storage_location': self.storage_location,
+        }
 
 
 class InventoryManager:
@@ -80,7 +279,233 @@ class InventoryManager:
 
     def __init__(self):
         self.products: Dict[str, Product] = {}
-        self.transactions: List[Dict] = []
+        self.transactions: Deque[Transaction] = deque(maxlen=MAX_TRANSACTIONS)
+        self._reset_storage()
+
+    def __setstate__(self, state: Dict):
+        """Restaura una copia (copy/pickle) y vincula sus productos a ella"""
+        self.__dict__.update(state)
+        for product in self.products.values():
+            product._owner = self
+
+    def _reset_storage(self):
+        """
+        Reinicia el almacenamiento columnar (Struct-of-Arrays)
+
+        Los campos consultados en cada escaneo se guardan en columnas
+        contiguas indexadas por fila; `_index` traduce ID -> fila y `_seq`
+        guarda el orden de inserción, que las filas pierden al eliminar.
+        Además se mantienen índices incrementales de stock bajo y de
+        vencimientos, los IDs de cada categoría, un índice invertido
+        token -> IDs y el nombre/descripción ya normalizados para la
+        búsqueda, para no recorrer todo el inventario en cada consulta.
+        """
+        self._index: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._stock = array('q')
+        self._min = array('q')
+        self._exp_ts = array('q')
+        self._seq = array('q')
+        self._next_seq = 0
+        self._low_stock_ids: set = set()
+        self._exp_heap: List[Tuple[int, str]] = []
+        self._by_category: Dict[ProductCategory, set] = {category: set() for category in ProductCategory}
+        self._nonempty_categories: set = set()
+        self._token_index: Dict[str, set] = {}
+        self._search_text: Dict[str, str] = {}
+        # Los productos de una carga anterior dejan de estar vinculados a este inventario
+        for product in self.products.values():
+            product._owner = None
+
+    def _append_rows(self, products: List[Product]):
+        """Agrega las filas de los productos al final de las columnas"""
+        # Las filas nuevas se arman antes de modificar nada: un valor fuera del
+        # rango de 64 bits deja el inventario intacto
+        stock = array('q', [product.stock_quantity for product in products])
+        min_stock = array('q', [product.min_stock for product in products])
+        exp_ts = array('q', [
+            _NO_EXPIRATION if product.expiration_date is None else product.expiration_date
+            for product in products
+        ])
+
+        start = len(self._ids)
+        self._ids.extend(product.id for product in products)
+        self._index.update((product.id, start + offset) for offset, product in enumerate(products))
+        self._stock.extend(stock)
+        self._min.extend(min_stock)
+        self._exp_ts.extend(exp_ts)
+        self._seq.extend(range(self._next_seq, self._next_seq + len(products)))
+        self._next_seq += len(products)
+        self._low_stock_ids.update(product.id for product in products if product.is_low_stock())
+
+        expirations = [
+            (product.expiration_date, product.id) for product in products
+            if product.expiration_date is not None
+        ]
+        if len(expirations) > len(self._exp_heap):
+            self._exp_heap.extend(expirations)
+            heapq.heapify(self._exp_heap)
+        else:
+            for entry in expirations:
+                heapq.heappush(self._exp_heap, entry)
+
+        for product in products:
+            self._add_to_category(product.id, product.category)
+            self._index_text(product)
+            product._owner = self
+
+    def _remove_row(self, product: Product):
+        """Quita la fila de un producto (swap-and-pop para mantener las columnas densas)"""
+        product_id = product.id
+        row = self._index.pop(product_id)
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._ids[row] = moved_id
+            self._stock[row] = self._stock[last]
+            self._min[row] = self._min[last]
+            self._exp_ts[row] = self._exp_ts[last]
+            self._seq[row] = self._seq[last]
+            self._index[moved_id] = row
+        self._ids.pop()
+        self._stock.pop()
+        self._min.pop()
+        self._exp_ts.pop()
+        self._seq.pop()
+        self._low_stock_ids.discard(product_id)
+        self._remove_from_category(product_id, product.category)
+        self._unindex_text(product_id)
+        del self._search_text[product_id]
+        product._owner = None
+        # Las entradas del heap quedan obsoletas; se compacta si acumula demasiadas
+        if len(self._exp_heap) > 2 * len(self._ids):
+            self._rebuild_expiration_heap()
+
+    def _add_to_category(self, product_id: str, category: ProductCategory):
+        """Agrega un ID al grupo de su categoría"""
+        self._by_category[category].add(product_id)
+        self._nonempty_categories.add(category)
+
+    def _remove_from_category(self, product_id: str, category: ProductCategory):
+        """Quita un ID del grupo de su categoría"""
+        bucket = self._by_category[category]
+        bucket.discard(product_id)
+        if not bucket:
+            self._nonempty_categories.discard(category)
+
+    def _index_text(self, product: Product):
+        """Indexa el nombre y la descripción de un producto para la búsqueda"""
+        text = f"{product.name}{_SEARCH_SEPARATOR}{product.description}".casefold()
+        # Reasignar la clave conserva su posición (orden de inserción) al editar
+        self._search_text[product.id] = text
+        for token in _tokenize(text):
+            posting = self._token_index.get(token)
+            if posting is None:
+                posting = self._token_index[token] = set()
+            posting.add(product.id)
+
+    def _unindex_text(self, product_id: str):
+        """Quita los tokens de un producto del índice invertido"""
+        # Los tokens se derivan del texto indexado, no del producto (que pudo cambiar)
+        for token in _tokenize(self._search_text[product_id]):
+            posting = self._token_index.get(token)
+            if posting is None:
+                continue
+            posting.discard(product_id)
+            if not posting:
+                del self._token_index[token]
+
+    def _update_product_field(self, product: Product, field_name: str, value):
+        """Asigna un campo indexado de un producto del inventario y actualiza columnas e índices"""
+        product_id = product.id
+        if field_name == 'id':
+            if value != product_id:
+                raise ValueError(
+                    f"No se puede cambiar el ID de {product_id} dentro del inventario; "
+                    "elimínelo y vuelva a agregarlo"
+                )
+            return
+
+        if field_name == 'category':
+            self._remove_from_category(product_id, product.category)
+            object.__setattr__(product, field_name, value)
+            self._add_to_category(product_id, value)
+        elif field_name in ('name', 'description'):
+            self._unindex_text(product_id)
+            object.__setattr__(product, field_name, value)
+            self._index_text(product)
+        else:
+            # La columna se escribe primero: si rechaza el valor, el producto no cambia
+            row = self._index[product_id]
+            if field_name == 'stock_quantity':
+                self._stock[row] = value
+            elif field_name == 'min_stock':
+                self._min[row] = value
+            else:
+                exp_ts = _NO_EXPIRATION if value is None else value
+                if self._exp_ts[row] != exp_ts:
+                    self._exp_ts[row] = exp_ts
+                    if exp_ts != _NO_EXPIRATION:
+                        heapq.heappush(self._exp_heap, (exp_ts, product_id))
+            object.__setattr__(product, field_name, value)
+            if product.is_low_stock():
+                self._low_stock_ids.add(product_id)
+            else:
+                self._low_stock_ids.discard(product_id)
+
+    def _rebuild_expiration_heap(self):
+        """Reconstruye el heap de vencimientos a partir de las columnas"""
+        self._exp_heap = [
+            (exp_ts, product_id) for product_id, exp_ts in zip(self._ids, self._exp_ts)
+            if exp_ts != _NO_EXPIRATION
+        ]
+        heapq.heapify(self._exp_heap)
+
+    def _is_current_expiration(self, entry: Tuple[int, str]) -> bool:
+        """Verifica que una entrada del heap siga reflejando al producto"""
+        exp_ts, product_id = entry
+        row = self._index.get(product_id)
+        return row is not None and self._exp_ts[row] == exp_ts
+
+    def _search_candidates(self, query_folded: str) -> Optional[set]:
+        """
+        Acota con el índice de tokens los productos que pueden contener la consulta
+
+        Una palabra de la consulta rodeada por otros caracteres (por ejemplo,
+        "acido" en "crema acido hialuronico") solo aparece en un texto como token
+        completo; las de los extremos pueden ser parte de un token más largo.
+
+        Returns:
+            Superconjunto de los IDs que coinciden, o None si ninguna palabra
+            de la consulta es necesariamente un token completo
+        """
+        end = len(query_folded)
+        postings = [
+            self._token_index.get(match.group(), set())
+            for match in _TOKEN_PATTERN.finditer(query_folded)
+            if match.start() > 0 and match.end() < end
+        ]
+        if not postings:
+            return None
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def _in_insertion_order(self, rows: Iterable[int]) -> List[int]:
+        """Ordena filas según el orden en que se agregaron los productos"""
+        return sorted(rows, key=self._seq.__getitem__)
+
+    def _iter_rows(self, rows: Iterable[int]) -> Iterator[Product]:
+        """Recorre perezosamente los productos de las filas indicadas"""
+        return map(self.products.__getitem__, map(self._ids.__getitem__, rows))
+
+    def _rows_to_products(self, rows: Iterable[int]) -> List[Product]:
+        """Materializa los productos de las filas indicadas"""
+        return list(self._iter_rows(rows))
+
+    def _ids_to_products(self, product_ids: Iterable[str]) -> List[Product]:
+        """Materializa un conjunto de IDs en orden de inserción"""
+        index = self._index
+        return self._rows_to_products(self._in_insertion_order(index[product_id] for product_id in product_ids))
 
     def add_product(self, product: Product) -> bool:
         """
@@ -93,14 +518,58 @@ class InventoryManager:
             bool: True si se agregó exitosamente
         """
         if product.id in self.products:
-            print(f"⚠️  Producto {product.id} ya existe en el inventario")
+            logger.warning("⚠️  Producto %s ya existe en el inventario", product.id)
+            return False
+        if product._owner is not None:
+            logger.warning("⚠️  Producto %s ya pertenece a otro inventario", product.id)
             return False
 
+        self._append_rows([product])
         self.products[product.id] = product
         self._log_transaction("ADD", product.id, product.stock_quantity)
-        print(f"✅ Producto {product.name} agregado exitosamente")
+        logger.info("✅ Producto %s agregado exitosamente", product.name)
         return True
 
+    def bulk_add(self, products: Iterable[Product]) -> int:
+        """
+        Agrega varios productos al inventario en un solo paso
+
+        Args:
+            products: Productos a agregar
+
+        Returns:
+            int: Cantidad de productos agregados (se omiten los IDs repetidos
+                y los productos que ya pertenecen a otro inventario)
+        """
+        batch: Dict[str, Product] = {}
+        received = 0
+        for product in products:
+            batch.setdefault(product.id, product)
+            received += 1
+
+        for product_id in batch.keys() & self.products.keys():
+            del batch[product_id]
+        for product_id in [product_id for product_id, product in batch.items() if product._owner is not None]:
+            del batch[product_id]
+        skipped = received - len(batch)
+        if skipped:
+            logger.warning("⚠️  %s productos omitidos por ID repetido o por pertenecer a otro inventario", skipped)
+        if not batch:
+            return 0
+
+        new_products = self._insert_batch(batch)
+        self._log_transaction("BULK_ADD", "", sum(product.stock_quantity for product in new_products),
+                              f"{len(new_products)} productos")
+        logger.info("✅ %s productos agregados exitosamente", len(new_products))
+        return len(new_products)
+
+    def _insert_batch(self, batch: Dict[str, Product]) -> List[Product]:
+        """Registra productos con IDs nuevos y distintos entre sí, sin transacción ni mensajes"""
+        new_products = list(batch.values())
+        self._append_rows(new_products)
+        self.products.update(batch)
+        return new_products
+
     def remove_product(self, product_id: str) -> bool:
         """
         Elimina un producto del inventario
@@ -112,13 +581,14 @@ class InventoryManager:
             bool: True si se eliminó exitosamente
         """
         if product_id not in self.products:
-            print(f"❌ Producto {product_id} no encontrado")
+            logger.warning("❌ Producto %s no encontrado", product_id)
             return False
 
         product = self.products[product_id]
         del self.products[product_id]
+        self._remove_row(product)
         self._log_transaction("REMOVE", product_id, 0)
-        print(f"🗑️  Producto {product.name} eliminado del inventario")
+        logger.info("🗑️  Producto %s eliminado del inventario", product.name)
         return True
 
     def update_stock(self, product_id: str, quantity_change: int, reason: str = "") -> bool:
@@ -133,25 +603,27 @@ class InventoryManager:
         Returns:
             bool: True si se actualizó exitosamente
         """
+        quantity_change = _to_quantity(quantity_change)
         if product_id not in self.products:
-            print(f"❌ Producto {product_id} no encontrado")
+            logger.warning("❌ Producto %s no encontrado", product_id)
             return False
 
         product = self.products[product_id]
         new_quantity = product.stock_quantity + quantity_change
 
         if new_quantity < 0:
-            print(f"❌ No hay suficiente stock. Disponible: {product.stock_quantity}")
+            logger.warning("❌ No hay suficiente stock. Disponible: %s", product.stock_quantity)
             return False
 
+        # La asignación actualiza la columna de stock y el índice de stock bajo
         product.stock_quantity = new_quantity
         self._log_transaction("UPDATE", product_id, quantity_change, reason)
 
         # Alertas automáticas
         if product.is_low_stock():
-            print(f"⚠️  ALERTA: Stock bajo para {product.name}. Cantidad: {product.stock_quantity}")
+            logger.warning("⚠️  ALERTA: Stock bajo para %s. Cantidad: %s", product.name, product.stock_quantity)
 
-        print(f"✅ Stock actualizado: {product.name} - Nuevo stock: {product.stock_quantity}")
+        logger.info("✅ Stock actualizado: %s - Nuevo stock: %s", product.name, product.stock_quantity)
         return True
 
     def get_product(self, product_id: str) -> Optional[Product]:
@@ -166,50 +638,97 @@ class InventoryManager:
             query: Texto a buscar
 
         Returns:
-            Lista de productos que coinciden
+            Lista de productos cuyo nombre o descripción contiene el texto
         """
-        query_lower = query.lower()
-        results = [
-            product for product in self.products.values()
-            if query_lower in product.name.lower() or query_lower in product.description.lower()
-        ]
-        return results
+        query_folded = query.casefold()
+        if _SEARCH_SEPARATOR in query_folded:
+            return []
+        search_text = self._search_text
+
+        # El índice de tokens solo descarta productos; la subcadena se verifica siempre
+        candidates = self._search_candidates(query_folded)
+        if candidates is not None:
+            return self._ids_to_products(
+                [product_id for product_id in candidates if query_folded in search_text[product_id]]
+            )
+
+        # Si el índice no acota, conviene recorrer los textos en orden
+        products = self.products
+        return [products[product_id] for product_id, text in search_text.items() if query_folded in text]
 
     def get_products_by_category(self, category: ProductCategory) -> List[Product]:
         """Obtiene todos los productos de una categoría"""
-        return [
-            product for product in self.products.values()
-            if product.category == category
-        ]
+        return self._ids_to_products(self._by_category[category])
+
+    def iter_low_stock_products(self) -> Iterator[Product]:
+        """
+        Recorre perezosamente los productos con stock bajo en orden de inserción
+
+        No se arman listas intermedias; el inventario no debe modificarse
+        durante el recorrido (para eso, use get_low_stock_products).
+        """
+        products = self.products
+        return compress(products.values(), map(self._low_stock_ids.__contains__, products))
 
     def get_low_stock_products(self) -> List[Product]:
         """Obtiene productos con stock bajo"""
-        return [
-            product for product in self.products.values()
-            if product.is_low_stock()
-        ]
+        return self._ids_to_products(self._low_stock_ids)
+
+    def iter_expired_products(self) -> Iterator[Product]:
+        """
+        Recorre perezosamente los productos vencidos en orden de inserción
+
+        No se arman listas intermedias; el inventario no debe modificarse
+        durante el recorrido (para retirar vencidos, use get_expired_products).
+        """
+        now_ts = int(time.time())
+        products = self.products
+        expirations = map(self._exp_ts.__getitem__, map(self._index.__getitem__, products))
+        return compress(products.values(), map(now_ts.__gt__, expirations))
 
     def get_expired_products(self) -> List[Product]:
         """Obtiene productos vencidos"""
-        return [
-            product for product in self.products.values()
-            if product.is_expired()
-        ]
+        now_ts = int(time.time())
+        expired_rows = compress(range(len(self._ids)), map(now_ts.__gt__, self._exp_ts))
+        return self._rows_to_products(self._in_insertion_order(expired_rows))
 
     def get_near_expiration_products(self, days_threshold: int = 30) -> List[Product]:
         """Obtiene productos próximos a vencer"""
-        return [
-            product for product in self.products.values()
-            if product.is_near_expiration(days_threshold)
-        ]
+        lower, upper = _near_expiration_window(int(time.time()), days_threshold)
+        heap = self._exp_heap
+
+        # Lo que vence antes de `lower` ya no puede volver a estar próximo a vencer
+        while heap and (heap[0][0] < lower or not self._is_current_expiration(heap[0])):
+            heapq.heappop(heap)
+
+        # Recorre solo la parte del heap con vencimiento anterior a `upper`
+        rows = set()
+        pending = [0] if heap else []
+        while pending:
+            position = pending.pop()
+            if position >= len(heap) or heap[position][0] >= upper:
+                continue
+            if self._is_current_expiration(heap[position]):
+                rows.add(self._index[heap[position][1]])
+            pending.append(2 * position + 1)
+            pending.append(2 * position + 2)
+        return self._rows_to_products(self._in_insertion_order(rows))
 
     def generate_stock_report(self) -> str:
         """Genera un reporte del estado del inventario"""
+        now_ts = int(time.time())
+        low_rows, expired_rows, near_rows, total_stock = _scan_inventory(
+            self._stock, self._min, self._exp_ts, now_ts,
+            _near_expiration_window(now_ts, 30)
+        )
+        low_rows = self._in_insertion_order(low_rows)
+        expired_rows = self._in_insertion_order(expired_rows)
+        near_rows = self._in_insertion_order(near_rows)
+
         total_products = len(self.products)
-        total_stock = sum(p.stock_quantity for p in self.products.values())
-        low_stock = len(self.get_low_stock_products())
-        expired = len(self.get_expired_products())
-        near_expiration = len(self.get_near_expiration_products())
+        low_stock = len(low_rows)
+        expired = len(expired_rows)
+        near_expiration = len(near_rows)
 
         report = f"""
 ╔══════════════════════════════════════════════════════════════╗
@@ -225,50 +744,54 @@ class InventoryManager:
 
 🏷️  PRODUCTOS POR CATEGORÍA:
 """
-        for category in ProductCategory:
-            count = len(self.get_products_by_category(category))
-            if count > 0:
-                report += f"   • {category.value.title()}: {count} productos\n"
+        # Solo categorías con productos, en el orden de ProductCategory
+        for category in sorted(self._nonempty_categories):
+            report += f"   • {category.slug.title()}: {len(self._by_category[category])} productos\n"
 
         if low_stock > 0:
             report += "\n⚠️  ALERTAS DE STOCK BAJO:\n"
-            for product in self.get_low_stock_products():
+            for product in self._iter_rows(low_rows):
                 report += f"   • {product.name}: {product.stock_quantity} unidades (mínimo: {product.min_stock})\n"
 
         if near_expiration > 0:
             report += "\n⏰ PRODUCTOS PRÓXIMOS A VENCER:\n"
-            for product in self.get_near_expiration_products():
-                days = product.days_until_expiration()
+            for row in near_rows:
+                product = self.products[self._ids[row]]
+                days = (self._exp_ts[row] - now_ts) // _SECONDS_PER_DAY
                 report += f"   • {product.name}: {days} días\n"
 
         if expired > 0:
             report += "\n❌ PRODUCTOS VENCIDOS (RETIRAR DEL INVENTARIO):\n"
-            for product in self.get_expired_products():
+            for product in self._iter_rows(expired_rows):
                 report += f"   • {product.name} - Lote: {product.batch_number}\n"
 
         report += "\n" + "═" * 64 + "\n"
         return report
 
     def _log_transaction(self, action: str, product_id: str, quantity: int, reason: str = ""):
-        """Registra una transacción en el historial"""
-        transaction = {
-            'timestamp': datetime.now().isoformat(),
-            'action': action,
-            'product_id': product_id,
-            'quantity': quantity,
-            'reason': reason
-        }
-        self.transactions.append(transaction)
+        """Registra una transacción en el historial (se descartan las más antiguas)"""
+        self.transactions.append(Transaction(int(time.time()), action, product_id, quantity, reason))
 
-    def save_to_file(self, filename: str = "inventory.json"):
-        """Guarda el inventario en un archivo JSON"""
+    def save_to_file(self, filename: str = "inventory.json", pretty: bool = False):
+        """
+        Guarda el inventario en un archivo JSON
+
+        Args:
+            filename: Ruta del archivo
+            pretty: True para un JSON indentado y legible; por defecto se escribe compacto
+        """
         data = {
             'products': [product.to_dict() for product in self.products.values()],
-            'transactions': self.transactions
+            'transactions': [transaction._asdict() for transaction in self.transactions]
         }
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"💾 Inventario guardado en {filename}")
+        # Un precio NaN o infinito se guarda con json (NaN, Infinity) para no perderlo como null
+        finite_prices = all(
+            math.isfinite(product.unit_price) for product in self.products.values()
+            if isinstance(product.unit_price, float)
+        )
+        with open(filename, 'wb') as f:
+            f.write(_dump_json(data, pretty, allow_orjson=finite_prices))
+        logger.info("💾 Inventario guardado en %s", filename)
 
     def load_from_file(self, filename: str = "inventory.json"):
         """Carga el inventario desde un archivo JSON"""
@@ -276,31 +799,46 @@ class InventoryManager:
             with open(filename, 'r', encoding='utf-8') as f:
                 data = json.load(f)
 
-            self.products = {}
-            for product_data in data.get('products', []):
-                # Convertir categoría de string a enum
-                product_data['category'] = ProductCategory(product_data['category'])
-                # Convertir fecha de string a datetime
-                if product_data.get('expiration_date'):
-                    product_data['expiration_date'] = datetime.fromisoformat(
-                        product_data['expiration_date']
-                    )
+            product_rows = data.get('products', [])
+            # Los archivos antiguos guardan fechas ISO 8601: cada valor distinto se convierte una vez
+            iso_dates = {
+                row['expiration_date'] for row in product_rows
+                if isinstance(row.get('expiration_date'), str)
+            }
+            epoch_by_iso = {value: _to_epoch_seconds(value) for value in iso_dates}
+
+            # La categoría (nombre, código o slug de archivos antiguos) se normaliza al construir
+            products: Dict[str, Product] = {}
+            for product_data in product_rows:
+                if product_data.get('expiration_date') in epoch_by_iso:
+                    product_data['expiration_date'] = epoch_by_iso[product_data['expiration_date']]
                 product = Product(**product_data)
-                self.products[product.id] = product
+                # Ante IDs repetidos en el archivo gana el último, como al cargar de a uno
+                products[product.id] = product
 
-            self.transactions = data.get('transactions', [])
-            print(f"📂 Inventario cargado desde {filename}")
+            self._reset_storage()
+            self.products = {}
+            self._insert_batch(products)
+
+            self.transactions = deque(
+                (Transaction(_to_epoch_seconds(t['timestamp']), t['action'], t['product_id'],
+                             t['quantity'], t.get('reason', ""))
+                 for t in data.get('transactions', [])),
+                maxlen=MAX_TRANSACTIONS
+            )
+            logger.info("📂 Inventario cargado desde %s", filename)
             return True
         except FileNotFoundError:
-            print(f"⚠️  Archivo {filename} no encontrado")
+            logger.warning("⚠️  Archivo %s no encontrado", filename)
             return False
         except Exception as e:
-            print(f"❌ Error al cargar inventario: {e}")
+            logger.error("❌ Error al cargar inventario: %s", e)
             return False
 
 
 def example_usage():
     """Ejemplo de uso del sistema de inventario"""
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     print("🏥 SISTEMA DE GESTIÓN DE INVENTARIO - FARMACIA NIETO\n")
 
     # Crear gestor de inventario